@@ -0,0 +1,234 @@
+"""
+Admission control in front of the chat and vision models.
+
+Every model call goes through an AdmissionController, which
+- caps how many calls run at once, overall and per lane,
+- queues the rest by lane priority (chat before image OCR); priority only
+  orders lanes of the same controller, so calls that should yield to each
+  other must share one,
+- charges the estimated tokens against a token bucket, where a lane's
+  reserve keeps part of the budget free for higher-priority lanes,
+- and rejects right away with a Retry-After hint when a lane's queue is
+  full or the bucket can't refill in time, instead of letting latency grow.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+
+# ------------------------------------------------------------------------------
+# Errors
+# ------------------------------------------------------------------------------
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a call can't be admitted.
+    status_code is 429 (rate limited) or 503 (queue full).
+    """
+
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+# ------------------------------------------------------------------------------
+# Token Estimation
+# ------------------------------------------------------------------------------
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token for English text).
+    Good enough for rate limiting, and much cheaper than running a tokenizer.
+    """
+    return len(text or "") // 4 + 1
+
+
+# ------------------------------------------------------------------------------
+# Token Bucket
+# ------------------------------------------------------------------------------
+
+class TokenBucket:
+    """
+    Refills at tokens_per_minute up to capacity.
+    A call reserves its tokens immediately and, if that leaves the bucket in
+    debt, waits until the refill has paid the debt back.
+    """
+
+    def __init__(self, tokens_per_minute: int, capacity: int = 0):
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = float(capacity or tokens_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: int, floor: float = 0.0) -> float:
+        """
+        Takes tokens from the bucket and returns how many seconds the caller
+        must wait before using them. floor is the level (as a fraction of
+        capacity) the caller must leave untouched for higher-priority lanes.
+        """
+        self._refill()
+        tokens = min(tokens, self.capacity)
+        self.tokens -= tokens
+
+        deficit = floor * self.capacity - self.tokens
+        return max(0.0, deficit / self.rate)
+
+    def refund(self, tokens: int):
+        self.tokens = min(self.capacity, self.tokens + min(tokens, self.capacity))
+
+
+# ------------------------------------------------------------------------------
+# Admission Controller
+# ------------------------------------------------------------------------------
+
+@dataclass
+class Lane:
+    priority: int          # lower runs first
+    max_queue: int         # waiting calls beyond this are rejected with 503
+    reserve: float = 0.0   # fraction of the token bucket left for higher lanes
+    max_in_flight: int = 0 # cap on this lane's running calls (0 = controller cap only)
+
+
+class AdmissionController:
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        lanes: Dict[str, Lane],
+        bucket: TokenBucket,
+        max_wait: float = 10.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.lanes = lanes
+        self.bucket = bucket
+        self.max_wait = max_wait
+
+        self.in_flight = 0
+        self.running = {lane: 0 for lane in lanes}
+        self.queued = {lane: 0 for lane in lanes}
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._order = itertools.count()
+        # Moving average of call duration, used for Retry-After on 503s
+        self._avg_seconds = 2.0
+
+    # ----- slots ----------------------------------------------------------------
+
+    def _lane_full(self, lane: str) -> bool:
+        cap = self.lanes[lane].max_in_flight
+        return bool(cap) and self.running[lane] >= cap
+
+    def _dispatch(self):
+        """
+        Hands free slots to waiters in priority order. A waiter whose lane is
+        at its own cap stays queued without holding up lower lanes.
+        """
+        blocked = []
+        while self._waiters and self.in_flight < self.max_concurrency:
+            waiter = heapq.heappop(self._waiters)
+            _, _, lane, future = waiter
+            if future.done():
+                continue
+            if self._lane_full(lane):
+                blocked.append(waiter)
+                continue
+            self.in_flight += 1
+            self.running[lane] += 1
+            future.set_result(None)
+
+        for waiter in blocked:
+            heapq.heappush(self._waiters, waiter)
+
+    def _release(self, lane: str):
+        self.in_flight -= 1
+        self.running[lane] -= 1
+        self._dispatch()
+
+    async def _acquire_slot(self, lane: str):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (self.lanes[lane].priority, next(self._order), lane, future))
+        self._dispatch()
+        if future.done():
+            return
+
+        self.queued[lane] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before we were cancelled
+            if future.done() and not future.cancelled():
+                self._release(lane)
+            raise
+        finally:
+            self.queued[lane] -= 1
+
+    def _queue_wait_estimate(self) -> float:
+        return self._avg_seconds * (len(self._waiters) + 1) / self.max_concurrency
+
+    # ----- public ---------------------------------------------------------------
+
+    def check(self, lane: str):
+        """
+        Cheap early rejection, so a request can bail out before doing any
+        retrieval work for a call that won't be admitted anyway.
+        """
+        if self.queued[lane] >= self.lanes[lane].max_queue:
+            raise AdmissionRejected(
+                503,
+                self._queue_wait_estimate(),
+                f"{self.name} {lane} queue is full",
+            )
+
+    @asynccontextmanager
+    async def admit(self, lane: str, tokens: int):
+        """
+        async with controller.admit("chat", estimate_tokens(prompt)):
+            ...call the model...
+        """
+        config = self.lanes[lane]
+        self.check(lane)
+
+        wait = self.bucket.reserve(tokens, floor=config.reserve)
+        if wait > self.max_wait:
+            self.bucket.refund(tokens)
+            raise AdmissionRejected(
+                429,
+                wait,
+                f"{self.name} token rate limit reached",
+            )
+        if wait:
+            await asyncio.sleep(wait)
+
+        await self._acquire_slot(lane)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+            self._release(lane)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "running": dict(self.running),
+            "max_concurrency": self.max_concurrency,
+            "queued": dict(self.queued),
+            "bucket_tokens": int(self.bucket.tokens),
+            "avg_seconds": round(self._avg_seconds, 2),
+        }
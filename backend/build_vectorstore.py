@@ -1,35 +1,83 @@
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
 from dotenv import load_dotenv
+from typing import Optional
+import faiss
+import numpy as np
+import os
+import shutil
 
-load_dotenv()
+from chunk_store import INDEX_FILE, ChunkStoreWriter, publish, staging_directory
+from ingest import DATA_DIR, batched, list_source_files, stream_chunks
 
-print("Loading documents from uc_davis_data/...")
-loader = DirectoryLoader('uc_davis_data/', glob="**/*.txt", loader_cls=TextLoader)
-documents = loader.load()
 
-print(f"✓ Loaded {len(documents)} documents")
+def build_local_index(
+    output_dir: str = "faiss_db",
+    data_dir: str = DATA_DIR,
+    embeddings: Optional[Embeddings] = None,
+) -> int:
+    """
+    Writes index.faiss + the chunk store into output_dir.
+    Returns the number of chunks (0 means nothing was written).
 
-print("Splitting documents into chunks...")
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200
-)
-chunks = text_splitter.split_documents(documents)
+    Everything is built in a staging directory and only replaces output_dir
+    once complete, so a failed build leaves the previous index untouched.
+    """
+    # Chunks stream in from the process pool while earlier batches are embedded.
+    # Vector i in the FAISS index is chunk i in the chunk store.
+    embeddings = embeddings or OpenAIEmbeddings()
+    index = None
+    staging = staging_directory(output_dir)
 
-print(f"✓ Split into {len(chunks)} chunks")
+    try:
+        with ChunkStoreWriter(staging) as chunk_store:
+            for batch in batched(stream_chunks(data_dir)):
+                vectors = np.array(
+                    embeddings.embed_documents([chunk.page_content for chunk in batch]),
+                    dtype="float32",
+                )
 
-print("Creating vector database (this may take a minute)...")
-embeddings = OpenAIEmbeddings()
-vectorstore = FAISS.from_documents(
-    documents=chunks,
-    embedding=embeddings
-)
+                if index is None:
+                    index = faiss.IndexFlatL2(vectors.shape[1])
+                index.add(vectors)
 
-# Save to disk
-vectorstore.save_local("faiss_db")
+                for chunk in batch:
+                    chunk_store.add(chunk.page_content, chunk.metadata)
 
-print("✓ Vector store created successfully in ./faiss_db!")
-print("\nYou can now use this database in your chatbot.")
\ No newline at end of file
+                print(f"  Embedded {len(chunk_store)} chunks...", flush=True)
+
+            total = len(chunk_store)
+
+        if index is None:
+            return 0
+
+        # Save to disk
+        faiss.write_index(index, os.path.join(staging, INDEX_FILE))
+        publish(staging, output_dir)
+        return total
+
+    finally:
+        # Already gone after a successful publish
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def main():
+    load_dotenv()
+
+    print(f"Loading and splitting {len(list_source_files())} documents from {DATA_DIR}...")
+    print("Creating vector database (this may take a minute)...")
+
+    total = build_local_index()
+
+    if not total:
+        print("No chunks found, nothing to save.")
+        return
+
+    print(f"✓ Split and embedded {total} chunks")
+    print("✓ Vector store created successfully in ./faiss_db!")
+    print("\nYou can now use this database in your chatbot.")
+
+
+# The process pool re-imports this module in its workers, so nothing may run at import time
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,171 @@
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 import os
 import sys
+import time
 
-# Force immediate output
-sys.stdout.flush()
-
-load_dotenv()
-
-print("Step 1: Connecting to Supabase...", flush=True)
-
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-
-if not supabase_url or not supabase_key:
-    print("ERROR: SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in .env file")
-    exit(1)
-
-supabase: Client = create_client(supabase_url, supabase_key)
-print("✓ Connected to Supabase", flush=True)
-
-# CLEAR OLD DATA TO PREVENT DUPLICATES
-print("Step 1.5: Clearing old data from Supabase...", flush=True)
-try:
-    # Delete all existing documents
-    supabase.table("documents").delete().neq("id", 0).execute()
-    print("✓ Old data cleared", flush=True)
-except Exception as e:
-    print(f"Warning: Could not clear old data: {e}", flush=True)
-
-print("Step 2: Loading documents from uc_davis_data/...", flush=True)
-loader = DirectoryLoader('uc_davis_data/', glob="**/*.txt", loader_cls=TextLoader)
-documents = loader.load()
-print(f"✓ Loaded {len(documents)} documents", flush=True)
-
-print("Step 3: Splitting documents into chunks...", flush=True)
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200
-)
-chunks = text_splitter.split_documents(documents)
-print(f"✓ Split into {len(chunks)} chunks", flush=True)
-
-print("Step 4: Creating embeddings...", flush=True)
-embeddings = OpenAIEmbeddings()
-print("✓ Embeddings model loaded", flush=True)
-
-print("Step 5: Uploading to Supabase (this will take a while)...", flush=True)
-
-# Upload chunks one by one so we can see progress
-for i, chunk in enumerate(chunks):
-    print(f"  Uploading chunk {i+1}/{len(chunks)}...", flush=True)
-    
-    # Get embedding
-    embedding = embeddings.embed_query(chunk.page_content)
-    
-    # Insert into Supabase
-    supabase.table("documents").insert({
-        "content": chunk.page_content,
-        "metadata": chunk.metadata,
-        "embedding": embedding
-    }).execute()
-
-print("✓ All chunks uploaded successfully!", flush=True)
-print("\n🎉 Your teammates can now access this database!")
\ No newline at end of file
+from ingest import DATA_DIR, batched, list_source_files, stream_chunks
+
+
+# ------------------------------------------------------------------------------
+# Builds
+# ------------------------------------------------------------------------------
+#
+# Every row in documents carries the build that uploaded it in
+# metadata->build, and match_documents is always called with the live build
+# as its filter. A rebuild uploads next to the live rows without ever being
+# visible, and goes live in one update once it's complete.
+# Needs supabase_builds.sql applied once.
+
+BUILDS_TABLE = "document_builds"
+# Servers poll the live build every minute or so (RefreshScheduler); a build
+# that stopped being live more recently than this may still be served.
+BUILD_GRACE = timedelta(hours=1)
+# Builds still uploading are left alone unless they started this long ago
+ABANDONED_AFTER = timedelta(hours=6)
+
+
+def live_build(supabase: Client) -> Optional[dict]:
+    """Newest completed build ({"id", "chunks", ...}), or None if there is none."""
+    result = (
+        supabase.table(BUILDS_TABLE).select("*")
+        .not_.is_("completed_at", "null")
+        .order("id", desc=True).limit(1)
+        .execute()
+    )
+    return result.data[0] if result.data else None
+
+
+def start_build(supabase: Client, at_least: int = 1) -> int:
+    """Registers a new, not yet live build and returns its id."""
+    newest = supabase.table(BUILDS_TABLE).select("id").order("id", desc=True).limit(1).execute()
+    build = max(at_least, newest.data[0]["id"] + 1 if newest.data else 1)
+    supabase.table(BUILDS_TABLE).insert({"id": build}).execute()
+    return build
+
+
+def publish_build(supabase: Client, build: int, chunks: int):
+    """Makes build the live one for every server that loads it from now on."""
+    supabase.table(BUILDS_TABLE).update({
+        "chunks": chunks,
+        "completed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }).eq("id", build).execute()
+
+
+def _timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def delete_builds(supabase: Client) -> List[int]:
+    """
+    Deletes the rows of builds nobody can still be serving: every build
+    except the live one, ones replaced less than BUILD_GRACE ago, and
+    uploads in progress. Abandoned uploads are deleted too.
+    Returns the ids that were kept.
+    """
+    now = datetime.now(timezone.utc)
+    builds = supabase.table(BUILDS_TABLE).select("*").order("id").execute().data
+
+    completed = [b for b in builds if b.get("completed_at")]
+    keep = []
+    for build, replaced_by in zip(completed, completed[1:] + [None]):
+        if replaced_by is None or now - _timestamp(replaced_by["completed_at"]) < BUILD_GRACE:
+            keep.append(build["id"])
+
+    keep += [
+        b["id"] for b in builds
+        if not b.get("completed_at") and now - _timestamp(b["started_at"]) < ABANDONED_AFTER
+    ]
+
+    supabase.table("documents").delete().not_.in_("metadata->>build", [str(b) for b in keep]).execute()
+    supabase.table(BUILDS_TABLE).delete().not_.in_("id", keep).execute()
+    return keep
+
+
+# ------------------------------------------------------------------------------
+# Upload
+# ------------------------------------------------------------------------------
+
+def upload_chunks(
+    supabase: Client,
+    build: int,
+    data_dir: str = DATA_DIR,
+    embeddings: Optional[Embeddings] = None,
+) -> int:
+    """
+    Uploads every chunk tagged with build. Nothing is served from these rows
+    until publish_build(build) is called.
+    Returns the number of chunks uploaded.
+    """
+    embeddings = embeddings or OpenAIEmbeddings()
+
+    # Files are split in a process pool while earlier batches are embedded and uploaded
+    total = 0
+    for batch in batched(stream_chunks(data_dir)):
+        vectors = embeddings.embed_documents([chunk.page_content for chunk in batch])
+
+        supabase.table("documents").insert([
+            {
+                "content": chunk.page_content,
+                "metadata": {**chunk.metadata, "build": build},
+                "embedding": embedding
+            }
+            for chunk, embedding in zip(batch, vectors)
+        ]).execute()
+
+        total += len(batch)
+        print(f"  Uploaded {total} chunks...", flush=True)
+
+    return total
+
+
+def main():
+    # Force immediate output
+    sys.stdout.flush()
+
+    load_dotenv()
+
+    print("Step 1: Connecting to Supabase...", flush=True)
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
+
+    if not supabase_url or not supabase_key:
+        print("ERROR: SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in .env file")
+        exit(1)
+
+    supabase: Client = create_client(supabase_url, supabase_key)
+    print("✓ Connected to Supabase", flush=True)
+
+    print("Step 2: Creating embeddings...", flush=True)
+    embeddings = OpenAIEmbeddings()
+    print("✓ Embeddings model loaded", flush=True)
+
+    print(f"Step 3: Streaming {len(list_source_files())} documents from {DATA_DIR} into Supabase "
+          "(this will take a while)...", flush=True)
+
+    build = start_build(supabase)
+    total = upload_chunks(supabase, build, embeddings=embeddings)
+
+    if not total:
+        print("No chunks found, the live build is unchanged.")
+        return
+
+    print(f"✓ All {total} chunks uploaded successfully as build {build}!", flush=True)
+
+    publish_build(supabase, build, total)
+    print(f"✓ Build {build} is live (running servers switch within a minute)", flush=True)
+
+    print("Clearing old builds from Supabase...", flush=True)
+    kept = delete_builds(supabase)
+    print(f"✓ Old builds cleared, kept {kept}", flush=True)
+    print("\n🎉 Your teammates can now access this database!")
+
+
+# The process pool re-imports this module in its workers, so nothing may run at import time
+if __name__ == "__main__":
+    main()
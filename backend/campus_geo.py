@@ -0,0 +1,378 @@
+"""
+Local geo + name index of campus places.
+
+Seeded from uc_davis_data/campus_buildings.txt and dorms.txt, and enriched
+with every Google Maps result we get back (persisted to a small JSON cache),
+so common location questions are answered in-process and Maps is only
+needed once per place. The text files carry names and descriptions but no
+addresses or coordinates; those only ever come from Maps.
+
+Names are matched fuzzily (aliases like "ARC" / "The Memo", typos), and a
+coarse lat/lng grid answers "near X" questions.
+"""
+
+from __future__ import annotations
+
+import difflib
+import json
+import math
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+SEED_FILES = [
+    "uc_davis_data/campus_buildings.txt",
+    "uc_davis_data/dorms.txt",
+]
+CACHE_FILE = "campus_geo_cache.json"
+
+# ~200m cells
+GRID_DEGREES = 0.002
+NEAR_RADIUS_METERS = 600
+MATCH_THRESHOLD = 0.85
+
+NEAR_INTENT = re.compile(r"\b(near|nearby|nearest|closest|close to|around)\b", re.IGNORECASE)
+
+
+@dataclass
+class Place:
+    name: str
+    aliases: List[str] = field(default_factory=list)
+    description: str = ""
+    address: str = ""
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    source: str = "seed"   # "seed" or "maps"
+
+    def names(self) -> List[str]:
+        return [self.name] + self.aliases
+
+    @property
+    def from_maps(self) -> bool:
+        """True once Maps has supplied a real address or coordinates."""
+        return self.source == "maps"
+
+
+# ------------------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------------------
+
+def normalize(text: str) -> str:
+    text = re.sub(r"[^a-z0-9 ]+", " ", text.lower().replace("’", "'").replace("'", ""))
+    words = [w for w in text.split() if w not in {"the", "uc", "davis", "ucd"}]
+    return " ".join(words)
+
+
+def distance_meters(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return int(math.floor(lat / GRID_DEGREES)), int(math.floor(lng / GRID_DEGREES))
+
+
+# ------------------------------------------------------------------------------
+# Seeding
+# ------------------------------------------------------------------------------
+
+def parse_campus_buildings(text: str) -> List[Place]:
+    """
+    Headings in capitals followed by "- " bullet lines, e.g.
+        MEMORIAL UNION (MU or "The Memo")
+        - Student center with Coffee House, meeting rooms
+    """
+    places = []
+    lines = [line.strip() for line in text.splitlines()]
+
+    for i, line in enumerate(lines):
+        heading = line.split("(")[0]
+        if not heading or heading != heading.upper() or not re.search(r"[A-Z]", heading):
+            continue
+
+        bullets = []
+        for following in lines[i + 1:]:
+            if not following.startswith("- "):
+                break
+            bullets.append(following[2:])
+
+        if not bullets:
+            continue
+
+        aliases = []
+        alias_match = re.search(r"\(([^)]*)\)", line)
+        if alias_match:
+            aliases = [a.strip(' "') for a in alias_match.group(1).split(" or ")]
+            line = line[:alias_match.start()].strip()
+
+        name = " ".join(
+            w.lower() if n and w.lower() in {"and", "of"} else w
+            for n, w in enumerate(line.title().split())
+        )
+
+        places.append(Place(
+            name=name,
+            aliases=aliases,
+            description="; ".join(bullets),
+        ))
+
+    return places
+
+
+def parse_dorms(text: str) -> List[Place]:
+    """
+    Housing areas are short headings ("Tercero") followed by a paragraph
+    listing their halls: "Three residence halls (Shasta, Tahoe, Yosemite)".
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    skip = ("Dining", "Services", "Advantages", "Key Things")
+
+    headings = []
+    for i, line in enumerate(lines):
+        if not line or len(line.split()) > 3 or line.startswith(skip):
+            continue
+        paragraph = next((l for l in lines[i + 1:] if l), "")
+        if len(paragraph) >= 150 and line.split()[0] in paragraph:
+            headings.append(i)
+
+    places = []
+    for n, i in enumerate(headings):
+        area = lines[i].split()[0]
+        # Everything up to the next area heading belongs to this area
+        section = "\n".join(lines[i + 1:headings[n + 1] if n + 1 < len(headings) else None])
+        paragraph = next(l for l in lines[i + 1:] if l)
+
+        places.append(Place(
+            name=f"{area} Residence Halls",
+            aliases=[area, f"{area} Area", f"{area} dorms"],
+            description=re.split(r"(?<=\.)\s", paragraph)[0],
+        ))
+
+        halls = re.search(r"residence halls?(?: buildings)? \(([^)]*)\)", section)
+        if halls:
+            for hall in halls.group(1).split(","):
+                if hall.strip():
+                    places.append(Place(
+                        name=f"{hall.strip()} Hall",
+                        description=f"Residence hall in the {area} area",
+                    ))
+
+        for facility, aliases in (
+            ("Dining Commons", [f"{area} DC"]),
+            ("Market", []),
+            ("Services Center", []),
+        ):
+            if f"{area} {facility}" in section:
+                places.append(Place(
+                    name=f"{area} {facility}",
+                    aliases=aliases,
+                    description=f"In the {area} residence hall area",
+                ))
+
+    return places
+
+
+def seed_places(paths: Iterable[str] = SEED_FILES) -> List[Place]:
+    places = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        if "dorms" in os.path.basename(path):
+            places += parse_dorms(text)
+        else:
+            places += parse_campus_buildings(text)
+    return places
+
+
+# ------------------------------------------------------------------------------
+# Index
+# ------------------------------------------------------------------------------
+
+class CampusGeoIndex:
+
+    def __init__(self, places: Iterable[Place] = (), cache_file: Optional[str] = None):
+        self.cache_file = cache_file
+        self.places: Dict[str, Place] = {}
+        self._grid: Dict[Tuple[int, int], List[str]] = {}
+        self._lock = threading.Lock()
+
+        for place in places:
+            self._add(place)
+
+    @classmethod
+    def load(cls, seed_files: Iterable[str] = SEED_FILES, cache_file: str = CACHE_FILE) -> "CampusGeoIndex":
+        index = cls(seed_places(seed_files), cache_file)
+
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, encoding="utf-8") as f:
+                    for data in json.load(f):
+                        index._add(Place(**data))
+            except Exception as e:
+                print("Campus geo cache error:", e)
+
+        return index
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    # ----- building -------------------------------------------------------------
+
+    def _add(self, place: Place):
+        key = normalize(place.name)
+        existing = self.places.get(key)
+
+        if existing:
+            # Maps data wins for address and coordinates, seeded text for descriptions
+            place.aliases = sorted(set(existing.aliases) | set(place.aliases))
+            place.description = existing.description or place.description
+            if place.lat is None:
+                place.lat, place.lng = existing.lat, existing.lng
+            self._ungrid(key, existing)
+
+        self.places[key] = place
+        if place.lat is not None:
+            self._grid.setdefault(_cell(place.lat, place.lng), []).append(key)
+
+    def _ungrid(self, key: str, place: Place):
+        if place.lat is not None:
+            cell = self._grid.get(_cell(place.lat, place.lng), [])
+            if key in cell:
+                cell.remove(key)
+
+    def remember_maps_results(self, results: List[dict], asked_for: Optional[Place] = None):
+        """
+        Adds Google Maps places results to the index and the on-disk cache.
+        asked_for is the seeded place the Maps query was about. The top result
+        is stored on it, with the Maps name as an alias ("Activities and
+        Recreation Center (ARC)"), but only if that name actually refers to
+        it; a restaurant near the Memorial Union is not the Memorial Union.
+        """
+        with self._lock:
+            for n, r in enumerate(results):
+                location = (r.get("geometry") or {}).get("location") or {}
+                if not r.get("name"):
+                    continue
+
+                name, aliases = r["name"], []
+                if n == 0 and asked_for is not None and self._refers_to(r["name"], asked_for):
+                    name, aliases = asked_for.name, [r["name"]]
+
+                self._add(Place(
+                    name=name,
+                    aliases=aliases,
+                    address=r.get("formatted_address", ""),
+                    lat=location.get("lat"),
+                    lng=location.get("lng"),
+                    source="maps",
+                ))
+
+            if self.cache_file:
+                maps_places = [asdict(p) for p in self.places.values() if p.source == "maps"]
+                try:
+                    with open(self.cache_file, "w", encoding="utf-8") as f:
+                        json.dump(maps_places, f, indent=2)
+                except OSError as e:
+                    print("Campus geo cache error:", e)
+
+    def _refers_to(self, maps_name: str, place: Place) -> bool:
+        best = self.match(maps_name, limit=1)
+        return bool(best) and normalize(best[0].name) == normalize(place.name)
+
+    # ----- lookup ---------------------------------------------------------------
+
+    def match(self, text: str, limit: int = 3) -> List[Place]:
+        """
+        Places mentioned in text, best match first.
+        Exact alias mentions score 1.0; typos are caught by comparing each
+        name against same-length word windows of the text.
+        """
+        words = normalize(text).split()
+        padded = f" {' '.join(words)} "
+        scores: Dict[str, float] = {}
+
+        # Copy: Maps results may be added from a worker thread meanwhile
+        for key, place in list(self.places.items()):
+            best = 0.0
+            for name in place.names():
+                name = normalize(name)
+                if not name:
+                    continue
+
+                if f" {name} " in padded:
+                    # Prefer longer names: "segundo dining commons" over "segundo"
+                    best = max(best, 1.0 + len(name) / 1000)
+                    continue
+
+                # Fuzzy matching is only reliable for longer names
+                size = len(name.split())
+                if len(name) < 6 or size > len(words):
+                    continue
+                for start in range(len(words) - size + 1):
+                    window = " ".join(words[start:start + size])
+                    ratio = difflib.SequenceMatcher(None, name, window).ratio()
+                    if ratio >= MATCH_THRESHOLD:
+                        best = max(best, ratio)
+
+            if best:
+                scores[key] = best
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [self.places[key] for key in ranked[:limit]]
+
+    def near(self, lat: float, lng: float, radius: float = NEAR_RADIUS_METERS) -> List[Tuple[Place, float]]:
+        reach = int(math.ceil(radius / 111000 / GRID_DEGREES))
+        row, col = _cell(lat, lng)
+
+        found = []
+        for r in range(row - reach, row + reach + 1):
+            for c in range(col - reach, col + reach + 1):
+                for key in list(self._grid.get((r, c), [])):
+                    place = self.places[key]
+                    d = distance_meters((lat, lng), (place.lat, place.lng))
+                    if d <= radius:
+                        found.append((place, d))
+
+        return sorted(found, key=lambda pair: pair[1])
+
+    def answer(self, query: str) -> str:
+        """
+        Formatted location info for places mentioned in query, or "" if none
+        are known. Places that Maps hasn't returned yet have no address or
+        coordinates, only their seeded description.
+        """
+        places = self.match(query)
+        if not places:
+            return ""
+
+        lines = [
+            f"{p.name} | {p.address or 'UC Davis campus'} | {p.description}".rstrip(" |")
+            for p in places
+        ]
+
+        def describe(d: float) -> str:
+            return "same area" if d < 50 else f"~{int(round(d, -1))} m away"
+
+        anchor = places[0]
+        if len(places) > 1 and anchor.lat is not None and places[1].lat is not None:
+            d = distance_meters((anchor.lat, anchor.lng), (places[1].lat, places[1].lng))
+            lines.append(f"{anchor.name} to {places[1].name} | {describe(d)}")
+
+        if NEAR_INTENT.search(query) and anchor.lat is not None:
+            nearby = [
+                f"{p.name} | {describe(d)}"
+                for p, d in self.near(anchor.lat, anchor.lng)
+                if p is not anchor
+            ][:5]
+            if nearby:
+                lines.append(f"Near {anchor.name}:")
+                lines += nearby
+
+        return "\n".join(lines)
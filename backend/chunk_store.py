@@ -0,0 +1,234 @@
+"""
+Memory-mapped chunk store for the local FAISS index.
+
+Replaces the pickled docstore (index.pkl) that FAISS.save_local writes.
+A store directory holds
+- chunks.bin     every chunk's text as one contiguous UTF-8 blob
+- offsets.bin    little-endian uint64 byte offsets into chunks.bin (count + 1)
+- meta_<j>.bin   little-endian int32 codes for metadata column j (-1 = missing)
+- metadata.json  chunk count plus each column's name and distinct values
+
+Everything is mapped read-only at startup, and a chunk's text is only
+decoded when it is actually returned, so startup time and resident memory
+stay flat as the corpus grows. Nothing is ever unpickled.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+from typing import Dict, List, Tuple
+
+
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "offsets.bin"
+METADATA_FILE = "metadata.json"
+INDEX_FILE = "index.faiss"
+
+# The .bin files are read with memoryview.cast, which uses native byte order
+assert sys.byteorder == "little", "chunk store files are little-endian"
+
+
+# ------------------------------------------------------------------------------
+# Writer
+# ------------------------------------------------------------------------------
+
+class ChunkStoreWriter:
+    """
+    Appends chunks one at a time, so the build scripts can write the store
+    while chunks are still streaming in.
+
+    Write into a fresh directory (see staging_directory) and publish it once
+    the whole build has succeeded; a store that is being served is mapped
+    into memory and must never be written over in place.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+        self._blob = open(os.path.join(directory, CHUNKS_FILE), "wb")
+        self._offsets = array("Q", [0])
+        # column name -> (distinct values, value key -> code, per-chunk codes)
+        self._columns: Dict[str, Tuple[list, dict, array]] = {}
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def add(self, text: str, metadata: dict):
+        data = text.encode("utf-8")
+        self._blob.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+        count = len(self)
+        for name, value in metadata.items():
+            if name not in self._columns:
+                # Chunks added before this column existed don't have it
+                self._columns[name] = ([], {}, array("i", [-1] * (count - 1)))
+
+            values, codes_by_key, codes = self._columns[name]
+            key = json.dumps(value, sort_keys=True)
+            if key not in codes_by_key:
+                codes_by_key[key] = len(values)
+                values.append(value)
+            codes.append(codes_by_key[key])
+
+        for _, _, codes in self._columns.values():
+            if len(codes) < count:
+                codes.append(-1)
+
+    def close(self):
+        """Writes the offsets and metadata files. Only call this on success."""
+        self._blob.close()
+
+        with open(os.path.join(self.directory, OFFSETS_FILE), "wb") as f:
+            self._offsets.tofile(f)
+
+        columns = []
+        for j, (name, (values, _, codes)) in enumerate(self._columns.items()):
+            with open(os.path.join(self.directory, f"meta_{j}.bin"), "wb") as f:
+                codes.tofile(f)
+            columns.append({"name": name, "values": values})
+
+        with open(os.path.join(self.directory, METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump({"count": len(self), "columns": columns}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Leave no metadata.json behind, so a partial store never loads
+            self._blob.close()
+
+
+def staging_directory(directory: str) -> str:
+    """
+    Empty directory next to directory to build a replacement in; on the same
+    filesystem, so publish() can rename it into place.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}-", dir=parent)
+
+
+def publish(staging: str, directory: str):
+    """
+    Moves a finished staging directory to directory, replacing what was there.
+    The old files are unlinked, not overwritten, so processes that still have
+    them mapped keep reading the old store.
+    """
+    old = None
+    if os.path.exists(directory):
+        old = staging + ".old"
+        os.replace(directory, old)
+    os.replace(staging, directory)
+
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+# ------------------------------------------------------------------------------
+# Reader
+# ------------------------------------------------------------------------------
+
+def _map(path: str) -> memoryview:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        # The mapping stays valid after the file is closed
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class ChunkStore:
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+        with open(os.path.join(directory, METADATA_FILE), encoding="utf-8") as f:
+            info = json.load(f)
+
+        self._count = info["count"]
+        self._blob = _map(os.path.join(directory, CHUNKS_FILE))
+        self._offsets = _map(os.path.join(directory, OFFSETS_FILE)).cast("Q")
+
+        self._columns: List[Tuple[str, list, memoryview]] = [
+            (column["name"], column["values"], _map(os.path.join(directory, f"meta_{j}.bin")).cast("i"))
+            for j, column in enumerate(info["columns"])
+        ]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def text(self, i: int) -> str:
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def metadata(self, i: int) -> dict:
+        return {
+            name: values[codes[i]]
+            for name, values, codes in self._columns
+            if codes[i] >= 0
+        }
+
+    def get(self, i: int) -> dict:
+        """Same shape as a Supabase match_documents row."""
+        return {"content": self.text(i), "metadata": self.metadata(i)}
+
+
+# ------------------------------------------------------------------------------
+# Local Index (FAISS vectors + chunk store)
+# ------------------------------------------------------------------------------
+
+class LocalIndex:
+    """
+    Searches a directory written by build_vectorstore.py.
+    Results use the same row shape as Supabase match_documents.
+    """
+
+    def __init__(self, directory: str):
+        import faiss
+
+        self.directory = directory
+        self.index = faiss.read_index(
+            os.path.join(directory, INDEX_FILE),
+            faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+        )
+        self.chunks = ChunkStore(directory)
+
+        if self.index.ntotal != len(self.chunks):
+            raise ValueError(
+                f"{directory}: index has {self.index.ntotal} vectors "
+                f"but the chunk store has {len(self.chunks)} chunks"
+            )
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query_embedding: List[float], k: int) -> List[dict]:
+        import numpy as np
+
+        distances, ids = self.index.search(np.array([query_embedding], dtype="float32"), k)
+
+        rows = []
+        for distance, i in zip(distances[0], ids[0]):
+            if i < 0:
+                continue
+            row = self.chunks.get(int(i))
+            # OpenAI embeddings are unit length, so squared L2 maps to cosine
+            row["similarity"] = 1 - float(distance) / 2
+            rows.append(row)
+        return rows
+
+
+def has_local_index(directory: str) -> bool:
+    return all(
+        os.path.exists(os.path.join(directory, name))
+        for name in (INDEX_FILE, CHUNKS_FILE, OFFSETS_FILE, METADATA_FILE)
+    )
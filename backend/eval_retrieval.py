@@ -0,0 +1,269 @@
+"""
+Offline retrieval sweep over chunking and top-k settings.
+
+For every (chunk_size, chunk_overlap) pair the uc_davis_data corpus is
+re-chunked and indexed in memory, then every k is scored against a labeled
+question set. Embeddings go through a local cache, so chunks that come out
+the same across configurations (or across runs) are only embedded once.
+
+Question set: one JSON object per line, e.g.
+  {"question": "...", "sources": ["dining.txt"], "answer": "optional substring"}
+A chunk counts as relevant when it comes from one of the sources and, if an
+answer is given, contains it (case-insensitive). Questions with no sources
+aren't answered by the corpus; they only count for --calibrate.
+
+--calibrate derives main2.py's answer-tier thresholds instead: the lowest
+top-match similarity at which retrieval is still right often enough to skip
+the full pipeline.
+
+Usage:
+  python eval_retrieval.py --chunk-sizes 500,1000,1500 --overlaps 0,200 --ks 3,5,8
+  python eval_retrieval.py --calibrate
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+import tiktoken
+from dotenv import load_dotenv
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from ingest import CACHE_DIR, CHUNK_OVERLAP, CHUNK_SIZE, DATA_DIR, cached_embeddings, stream_chunks
+
+# Same encoding gpt-4o-mini uses
+tokenizer = tiktoken.get_encoding("o200k_base")
+
+# Share of confident questions whose top chunk(s) must be relevant, per tier
+EXTRACTIVE_PRECISION = 0.95
+SHORT_PRECISION = 0.9
+# main2.SHORT_CONTEXT_CHUNKS
+SHORT_CONTEXT_CHUNKS = 2
+
+
+# ------------------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------------------
+
+def parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_questions(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(chunk: Document, question: dict) -> bool:
+    source = os.path.basename(chunk.metadata.get("source", ""))
+    if source not in question["sources"]:
+        return False
+
+    answer = question.get("answer")
+    return not answer or answer.lower() in chunk.page_content.lower()
+
+
+# ------------------------------------------------------------------------------
+# Evaluation
+# ------------------------------------------------------------------------------
+
+def evaluate(
+    vectorstore: FAISS,
+    questions: List[dict],
+    query_vectors: List[List[float]],
+    k: int,
+) -> dict:
+    hits = 0
+    reciprocal_ranks = 0.0
+    prompt_tokens = 0
+    latencies = []
+
+    for question, vector in zip(questions, query_vectors):
+        started = time.perf_counter()
+        results = vectorstore.similarity_search_by_vector(vector, k=k)
+        latencies.append(time.perf_counter() - started)
+
+        # Same context block main2.py builds from the matches
+        context = "\n\n".join(chunk.page_content for chunk in results)
+        prompt_tokens += len(tokenizer.encode(context))
+
+        for rank, chunk in enumerate(results, start=1):
+            if is_relevant(chunk, question):
+                hits += 1
+                reciprocal_ranks += 1 / rank
+                break
+
+    latencies.sort()
+    n = len(questions)
+    answerable = sum(1 for q in questions if q["sources"]) or 1
+    return {
+        "recall": hits / answerable,
+        "mrr": reciprocal_ranks / answerable,
+        "prompt_tokens": prompt_tokens / n,
+        "latency_ms_p50": latencies[n // 2] * 1000,
+        "latency_ms_p95": latencies[min(n - 1, int(n * 0.95))] * 1000,
+    }
+
+
+def min_similarity(scored: List[Tuple[float, bool]], precision: float) -> Optional[float]:
+    """
+    Lowest cutoff at which at least `precision` of the questions whose top
+    similarity clears it were retrieved correctly. None if none gets there.
+    """
+    cutoff = None
+    correct = 0
+    for n, (similarity, relevant) in enumerate(sorted(scored, reverse=True), start=1):
+        correct += relevant
+        if correct / n >= precision:
+            cutoff = similarity
+    return cutoff
+
+
+def calibrate(vectorstore: FAISS, questions: List[dict], query_vectors: List[List[float]]) -> dict:
+    """
+    The extractive tier answers from the top chunk, the short tier from the
+    top SHORT_CONTEXT_CHUNKS, so each is scored on what it actually reads.
+    """
+    extractive, short = [], []
+
+    for question, vector in zip(questions, query_vectors):
+        results = vectorstore.similarity_search_with_score_by_vector(vector, k=SHORT_CONTEXT_CHUNKS)
+        if not results:
+            continue
+
+        # Squared L2 between unit vectors -> cosine, as in chunk_store.LocalIndex
+        similarity = 1 - float(results[0][1]) / 2
+        extractive.append((similarity, is_relevant(results[0][0], question)))
+        short.append((similarity, any(is_relevant(chunk, question) for chunk, _ in results)))
+
+    thresholds = {}
+    for name, scored, precision in (
+        ("EXTRACTIVE_MIN_SIMILARITY", extractive, EXTRACTIVE_PRECISION),
+        ("SHORT_MIN_SIMILARITY", short, SHORT_PRECISION),
+    ):
+        cutoff = min_similarity(scored, precision)
+        thresholds[name] = {
+            "min_similarity": cutoff,
+            "precision": precision,
+            "fast_tier_questions": sum(1 for s, _ in scored if cutoff is not None and s >= cutoff),
+            "questions": len(scored),
+        }
+    return thresholds
+
+
+def build_index(args, embeddings, chunk_size: int, chunk_overlap: int) -> Tuple[FAISS, int, float]:
+    print(f"Indexing chunk_size={chunk_size} chunk_overlap={chunk_overlap}...", flush=True)
+
+    chunks = sorted(
+        stream_chunks(args.data_dir, chunk_size, chunk_overlap),
+        key=lambda c: (c.metadata.get("source", ""), c.page_content),
+    )
+    texts = [c.page_content for c in chunks]
+
+    started = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    embed_seconds = time.perf_counter() - started
+
+    vectorstore = FAISS.from_embeddings(
+        list(zip(texts, vectors)),
+        embeddings,
+        metadatas=[c.metadata for c in chunks],
+    )
+    return vectorstore, len(chunks), embed_seconds
+
+
+def sweep(args) -> List[dict]:
+    questions = load_questions(args.questions)
+    embeddings = cached_embeddings(args.cache_dir)
+
+    # Questions don't depend on the chunking, embed them once
+    query_vectors = embeddings.embed_documents([q["question"] for q in questions])
+
+    rows = []
+    for chunk_size in args.chunk_sizes:
+        for chunk_overlap in args.overlaps:
+            if chunk_overlap >= chunk_size:
+                continue
+
+            vectorstore, chunks, embed_seconds = build_index(args, embeddings, chunk_size, chunk_overlap)
+
+            for k in args.ks:
+                row = {
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "k": k,
+                    "chunks": chunks,
+                    "embed_seconds": embed_seconds,
+                }
+                row.update(evaluate(vectorstore, questions, query_vectors, k))
+                rows.append(row)
+
+    return rows
+
+
+def print_table(rows: List[dict]):
+    header = f"{'size':>6} {'overlap':>7} {'k':>3} {'chunks':>7} {'recall@k':>9} {'MRR':>6} " \
+             f"{'tokens/q':>9} {'p50 ms':>7} {'p95 ms':>7}"
+    print("\n" + header)
+    print("-" * len(header))
+
+    for r in rows:
+        print(
+            f"{r['chunk_size']:>6} {r['chunk_overlap']:>7} {r['k']:>3} {r['chunks']:>7} "
+            f"{r['recall']:>9.3f} {r['mrr']:>6.3f} {r['prompt_tokens']:>9.0f} "
+            f"{r['latency_ms_p50']:>7.2f} {r['latency_ms_p95']:>7.2f}"
+        )
+
+
+# ------------------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------------------
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", default="eval_questions.jsonl")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--chunk-sizes", type=parse_ints, default=[500, CHUNK_SIZE, 1500])
+    parser.add_argument("--overlaps", type=parse_ints, default=[0, 100, CHUNK_OVERLAP])
+    parser.add_argument("--ks", type=parse_ints, default=[3, 5, 8])
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="derive main2.py's answer-tier thresholds at the production chunking")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        questions = load_questions(args.questions)
+        embeddings = cached_embeddings(args.cache_dir)
+        query_vectors = embeddings.embed_documents([q["question"] for q in questions])
+        vectorstore, _, _ = build_index(args, embeddings, CHUNK_SIZE, CHUNK_OVERLAP)
+
+        print()
+        for name, result in calibrate(vectorstore, questions, query_vectors).items():
+            if result["min_similarity"] is None:
+                print(f"{name}: no cutoff reaches {result['precision']:.0%} precision, "
+                      f"leave this tier off (1.0)")
+                continue
+            print(f"{name}={result['min_similarity']:.3f}  "
+                  f"({result['fast_tier_questions']}/{result['questions']} questions clear it)")
+        return
+
+    rows = sweep(args)
+    print_table(rows)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+
+# The process pool in ingest.py re-imports this module in its workers
+if __name__ == "__main__":
+    main()
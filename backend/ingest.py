@@ -0,0 +1,177 @@
+"""
+Streaming ingestion front end shared by the build_vectorstore* scripts.
+
+Files are read and split in a process pool and the finished chunks are
+handed to the caller through a bounded queue, so embedding (network bound)
+can start while the remaining files are still being split (CPU bound).
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+from langchain_classic.embeddings import CacheBackedEmbeddings
+from langchain_classic.storage import LocalFileStore
+from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+DATA_DIR = "uc_davis_data/"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# How many chunks may sit between the splitters and the embedder.
+QUEUE_SIZE = 512
+# How many chunks go into a single embeddings request.
+EMBED_BATCH_SIZE = 64
+# Embeddings of chunk texts we've already seen, keyed by a hash of the text
+CACHE_DIR = ".embedding_cache"
+
+# Workers start from a fresh interpreter instead of a fork of the caller:
+# refresh.py runs ingestion inside the multi-threaded API server, and forking
+# that (event loop, thread pools, FAISS/OpenMP threads) can deadlock the
+# children and copies the whole server heap into each one.
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+_DONE = object()
+
+
+# ------------------------------------------------------------------------------
+# Loading + Splitting (runs inside the worker processes)
+# ------------------------------------------------------------------------------
+
+def list_source_files(data_dir: str = DATA_DIR) -> List[str]:
+    return sorted(str(p) for p in Path(data_dir).glob("**/*.txt"))
+
+
+def load_and_split(
+    path: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> List[Document]:
+    """
+    Loads one file and splits it into chunks.
+    Must stay a module-level function so the process pool can pickle it.
+    """
+    documents = TextLoader(path).load()
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    return text_splitter.split_documents(documents)
+
+
+# ------------------------------------------------------------------------------
+# Streaming
+# ------------------------------------------------------------------------------
+
+def stream_chunks(
+    data_dir: str = DATA_DIR,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    max_workers: Optional[int] = None,
+    queue_size: int = QUEUE_SIZE,
+) -> Iterator[Document]:
+    """
+    Yields chunks as soon as their file has been split.
+    Chunk order across files is not deterministic.
+    """
+    paths = list_source_files(data_dir)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    chunk_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Blocks while the queue is full, but gives up once the consumer is gone.
+        while not stop.is_set():
+            try:
+                chunk_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=MP_CONTEXT) as pool:
+                pending = set()
+                remaining = iter(paths)
+
+                # Keep only a small window of files in flight so finished
+                # results don't pile up faster than they are embedded.
+                for path in remaining:
+                    pending.add(pool.submit(load_and_split, path, chunk_size, chunk_overlap))
+                    if len(pending) >= max_workers * 2:
+                        break
+
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        for chunk in future.result():
+                            if not put(chunk):
+                                pool.shutdown(cancel_futures=True)
+                                return
+
+                        path = next(remaining, None)
+                        if path is not None:
+                            pending.add(pool.submit(load_and_split, path, chunk_size, chunk_overlap))
+
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = chunk_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def batched(chunks: Iterable[Document], batch_size: int = EMBED_BATCH_SIZE) -> Iterator[List[Document]]:
+    batch: List[Document] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ------------------------------------------------------------------------------
+# Embedding Cache
+# ------------------------------------------------------------------------------
+
+def cached_embeddings(cache_dir: str = CACHE_DIR) -> CacheBackedEmbeddings:
+    """
+    OpenAIEmbeddings backed by an on-disk cache, so chunks that didn't
+    change since the last build (or sweep) aren't embedded again.
+    """
+    underlying = OpenAIEmbeddings()
+    return CacheBackedEmbeddings.from_bytes_store(
+        underlying,
+        LocalFileStore(cache_dir),
+        namespace=underlying.model,
+        key_encoder="sha256",
+    )
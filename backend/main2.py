@@ -1,24 +1,32 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import os
 import re
 import base64
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
+from cachetools import LRUCache
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 from ddgs import DDGS
 import googlemaps
 import requests
 
+from admission import AdmissionController, AdmissionRejected, Lane, TokenBucket, estimate_tokens
+from campus_geo import NEAR_INTENT, CampusGeoIndex
+from refresh import IndexManager, IndexVersion, RefreshScheduler
+
 
 # ------------------------------------------------------------------------------
 # App + CORS
@@ -40,7 +48,7 @@ app.add_middleware(
 
 @app.get("/")
 def root():
-    return {"ok": True, "routes": ["/docs", "/redoc", "/chat", "/upload-image"]}
+    return {"ok": True, "routes": ["/docs", "/redoc", "/chat", "/chat/batch", "/upload-image", "/admission", "/index"]}
 
 
 # ------------------------------------------------------------------------------
@@ -50,10 +58,16 @@ def root():
 load_dotenv()
 
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.4)
+# Short-context tier for simple questions (see Answer Tiers below)
+SHORT_MAX_TOKENS = 200
+short_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2, max_tokens=SHORT_MAX_TOKENS)
 vision_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 
 embeddings = OpenAIEmbeddings()
 
+# Knowledge-base chunks per question; see eval_retrieval.py for tuning
+MATCH_COUNT = int(os.getenv("MATCH_COUNT", "5"))
+
 supabase_client = None
 if os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_KEY"):
     supabase_client: Client = create_client(
@@ -62,9 +76,99 @@ if os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_KEY"):
     )
     print("✓ Connected to Supabase")
 
+# Live knowledge-base version, swapped in place by the background refresh.
+# With Supabase it's the build retrieval is filtered on (needs
+# supabase_builds.sql applied); without, it holds the memory-mapped local index.
+index_manager = IndexManager.load(supabase=supabase_client)
+if supabase_client:
+    print(f"✓ Serving Supabase build {index_manager.version} ({index_manager.current.chunks} chunks)")
+elif index_manager.current.index:
+    print(f"✓ Loaded local index v{index_manager.version} ({index_manager.current.chunks} chunks)")
+
+# (index version, normalized question) -> matches
+retrieval_cache: LRUCache = LRUCache(maxsize=int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048")))
+index_manager.on_swap(lambda old, new: retrieval_cache.clear())
+
+refresh_scheduler = RefreshScheduler(
+    index_manager,
+    interval_hours=float(os.getenv("REFRESH_INTERVAL_HOURS", "0")),
+    supabase=supabase_client,
+)
+
+
+@app.on_event("startup")
+async def start_refresh_scheduler():
+    refresh_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_refresh_scheduler():
+    refresh_scheduler.stop()
+
+
+@app.get("/index")
+def index_info():
+    return {
+        **index_manager.current.info(),
+        "backend": "supabase" if supabase_client else "local",
+        "refresh": refresh_scheduler.info(),
+        "cached_retrievals": len(retrieval_cache),
+    }
+
 gmaps = googlemaps.Client(key=os.getenv("GOOGLE_MAPS_API_KEY")) \
     if os.getenv("GOOGLE_MAPS_API_KEY") else None
 
+# Campus buildings + dorms, plus every place Maps has returned before
+campus_index = CampusGeoIndex.load()
+print(f"✓ Loaded campus geo index ({len(campus_index)} places)")
+
+
+# ------------------------------------------------------------------------------
+# Admission Control
+# ------------------------------------------------------------------------------
+
+# Both models are gpt-4o-mini on the same OpenAI account, so chat, image OCR
+# and bulk work all go through one gate: they share its concurrency slots and
+# token budget, and a freed slot always goes to the highest-priority lane
+# waiting for it (chat, then OCR, then batch).
+openai_bucket = TokenBucket(int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000")))
+
+openai_gate = AdmissionController(
+    "openai",
+    max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+    lanes={
+        "chat": Lane(priority=0, max_queue=32),
+        # OCR may not dip into the last quarter of the token budget, and slow
+        # vision calls may only hold a few of the shared slots
+        "ocr": Lane(
+            priority=1,
+            max_queue=8,
+            reserve=0.25,
+            max_in_flight=int(os.getenv("VISION_MAX_CONCURRENCY", "2")),
+        ),
+        # /chat/batch leaves half the token budget for interactive chat
+        "batch": Lane(priority=2, max_queue=32, reserve=0.5),
+    },
+    bucket=openai_bucket,
+)
+
+# Output allowance added to every chat estimate; images are billed per tile
+CHAT_OUTPUT_TOKENS = 500
+IMAGE_TOKENS = 1500
+
+
+def admission_error(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail=e.reason,
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+@app.get("/admission")
+def admission():
+    return openai_gate.stats()
+
 
 # ------------------------------------------------------------------------------
 # SYSTEM PROMPT
@@ -81,6 +185,12 @@ CRITICAL RULES:
 - Prefer real retrieved data over assumptions.
 """
 
+SHORT_SYSTEM_PROMPT = """
+You are a helpful and friendly UC Davis campus assistant.
+Answer in one to three sentences using only the context provided.
+If the context doesn't contain the answer, say you're not sure.
+"""
+
 
 # ------------------------------------------------------------------------------
 # Schemas
@@ -95,6 +205,11 @@ class ChatRequest(BaseModel):
     conversation_history: List[HistoryMessage] = []
     image_content: Optional[str] = None
 
+class BatchChatRequest(BaseModel):
+    questions: List[str]
+    conversation_history: List[HistoryMessage] = []
+    max_concurrency: int = 4
+
 
 # ------------------------------------------------------------------------------
 # Image Upload Endpoint
@@ -126,7 +241,8 @@ async def upload_image(file: UploadFile = File(...)):
             )
             return vision_llm.invoke([message]).content
 
-        extracted = await asyncio.to_thread(parse)
+        async with openai_gate.admit("ocr", IMAGE_TOKENS):
+            extracted = await asyncio.to_thread(parse)
 
         return {
             "text": extracted,
@@ -134,6 +250,9 @@ async def upload_image(file: UploadFile = File(...)):
             "length": len(extracted)
         }
 
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -294,21 +413,35 @@ async def search_reddit(query: str) -> str:
 # ------------------------------------------------------------------------------
 
 async def search_campus_location(query: str) -> str:
+    # Places Maps has returned before are answered locally. Seeded places only
+    # have a description, so Maps is asked about them once and cached.
+    places = campus_index.match(query)
+    if places and places[0].from_maps:
+        return campus_index.answer(query)
+
+    # "Food near the MU" returns places around the MU, not the MU itself
+    asked_for = places[0] if places and not NEAR_INTENT.search(query) else None
+
     if not gmaps:
-        return ""
+        return campus_index.answer(query)
 
     try:
         def run():
-            return gmaps.places(
+            results = gmaps.places(
                 query=f"{query} UC Davis",
                 location=(38.5382, -121.7617),
                 radius=3000,
             )
+            campus_index.remember_maps_results(
+                results.get("results", [])[:5],
+                asked_for=asked_for,
+            )
+            return results
 
         results = await asyncio.to_thread(run)
 
         if not results.get("results"):
-            return ""
+            return campus_index.answer(query)
 
         formatted = []
         for p in results["results"][:5]:
@@ -319,93 +452,494 @@ async def search_campus_location(query: str) -> str:
         return "\n".join(formatted)
 
     except:
-        return ""
+        return campus_index.answer(query)
 
 
 # ------------------------------------------------------------------------------
-# Chat Endpoint
+# Chat Pipeline
 # ------------------------------------------------------------------------------
 
-@app.post("/chat")
-async def chat(req: ChatRequest):
-    try:
-        uc_davis_context = ""
-        web_results = ""
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
 
-        # STEP 1 — Vector search
-        if supabase_client:
-            query_embedding = await asyncio.to_thread(
-                embeddings.embed_query, req.message
-            )
 
-            def search():
-                return supabase_client.rpc(
-                    "match_documents",
-                    {"query_embedding": query_embedding, "match_count": 5},
-                ).execute()
+def has_knowledge_base(current: IndexVersion) -> bool:
+    return bool(supabase_client or current.index)
 
-            res = await asyncio.to_thread(search)
 
-            if res.data:
-                uc_davis_context = "\n\n".join(d["content"] for d in res.data)
+async def retrieve(query_embedding: List[float], current: IndexVersion) -> List[dict]:
+    """
+    Top matches as match_documents rows (content, metadata, similarity).
+    current is the index snapshot the request started with.
+    """
+    if supabase_client:
+        def match(params: dict) -> List[dict]:
+            return supabase_client.rpc(
+                "match_documents",
+                {"query_embedding": query_embedding, "match_count": MATCH_COUNT, **params},
+            ).execute().data
+
+        def search():
+            if not current.tagged:
+                return match({})
+
+            # Rows of a build that's still uploading (or already retired) are
+            # never returned next to the live ones
+            try:
+                rows = match({"filter": {"build": current.version}})
+                if rows or not current.chunks:
+                    return rows
+                reason = "no rows for the live build"
+            except APIError as e:
+                reason = e.message
+
+            # An older match_documents without the filter argument
+            print(f"WARNING: match_documents can't filter on the build ({reason}). "
+                  "Apply backend/supabase_builds.sql; searching unfiltered until then.", flush=True)
+            current.tagged = False
+            return match({})
+
+    elif current.index:
+        def search():
+            return current.index.search(query_embedding, MATCH_COUNT)
+
+    else:
+        return []
 
-        # STEP 2 — Name Detection (Generalized)
-        combined_text = req.message or ""
-        if req.image_content:
-            combined_text += " " + req.image_content
+    return await asyncio.to_thread(search) or []
 
-        # STEP 2 — Always do general web search on full query
-        general_web = await search_person_web(req.message)
-        if general_web:
-            web_results += f"\n=== General Web Search ===\n{general_web}\n"
 
-        # STEP 3 — Name Detection for Professor-specific lookup
-        names = extract_professor_names(combined_text)
-        print("Detected names:", names)
+def cached_matches(question: str, current: IndexVersion) -> Optional[List[dict]]:
+    return retrieval_cache.get((current.version, normalize_question(question)))
 
-        for name in names:
-            rmp_data = await search_rate_my_professor(name)
-            if rmp_data:
-                web_results += f"\n=== RateMyProfessor for {name} ===\n{rmp_data}\n"
 
-        # STEP 3 — Reddit
-        reddit = await search_reddit(req.message)
-        if reddit:
-            web_results += f"\n=== Reddit ===\n{reddit}\n"
+def cache_matches(question: str, current: IndexVersion, matches: List[dict]):
+    # A request that outlived a swap must not refill the cache with old matches
+    if current is index_manager.current:
+        retrieval_cache[(current.version, normalize_question(question))] = matches
 
-        # STEP 4 — Maps
-        maps = await search_campus_location(req.message)
-        if maps:
-            web_results += f"\n=== Maps ===\n{maps}\n"
 
-        # STEP 5 — Build Prompt
-        context_blocks = []
+async def gather_web_results(message: str, image_content: Optional[str] = None) -> str:
+    web_results = ""
 
-        if req.image_content:
-            context_blocks.append(f"=== Image Content ===\n{req.image_content}")
+    # Name Detection (Generalized)
+    combined_text = message or ""
+    if image_content:
+        combined_text += " " + image_content
 
-        if uc_davis_context:
-            context_blocks.append(f"=== Knowledge Base ===\n{uc_davis_context}")
+    # Always do general web search on full query
+    general_web = await search_person_web(message)
+    if general_web:
+        web_results += f"\n=== General Web Search ===\n{general_web}\n"
 
-        if web_results:
-            context_blocks.append(web_results)
+    # Name Detection for Professor-specific lookup
+    names = extract_professor_names(combined_text)
+    print("Detected names:", names)
 
-        final_message = "\n\n".join(context_blocks) + f"\n\nUser question: {req.message}"
+    for name in names:
+        rmp_data = await search_rate_my_professor(name)
+        if rmp_data:
+            web_results += f"\n=== RateMyProfessor for {name} ===\n{rmp_data}\n"
 
-        messages = [SystemMessage(content=SYSTEM_PROMPT)]
+    # Reddit
+    reddit = await search_reddit(message)
+    if reddit:
+        web_results += f"\n=== Reddit ===\n{reddit}\n"
 
-        for m in req.conversation_history:
-            messages.append(
-                HumanMessage(content=m.content)
-                if m.role == "user"
-                else AIMessage(content=m.content)
-            )
+    # Maps
+    maps = await search_campus_location(message)
+    if maps:
+        web_results += f"\n=== Maps ===\n{maps}\n"
+
+    return web_results
+
+
+def build_messages(
+    message: str,
+    uc_davis_context: str,
+    web_results: str,
+    conversation_history: List[HistoryMessage],
+    image_content: Optional[str] = None,
+    system_prompt: str = SYSTEM_PROMPT,
+) -> list:
+    context_blocks = []
+
+    if image_content:
+        context_blocks.append(f"=== Image Content ===\n{image_content}")
+
+    if uc_davis_context:
+        context_blocks.append(f"=== Knowledge Base ===\n{uc_davis_context}")
+
+    if web_results:
+        context_blocks.append(web_results)
+
+    final_message = "\n\n".join(context_blocks) + f"\n\nUser question: {message}"
+
+    messages = [SystemMessage(content=system_prompt)]
+
+    for m in conversation_history:
+        messages.append(
+            HumanMessage(content=m.content)
+            if m.role == "user"
+            else AIMessage(content=m.content)
+        )
+
+    messages.append(HumanMessage(content=final_message))
+    return messages
+
+
+async def generate(
+    messages: list,
+    lane: str,
+    model: ChatOpenAI = llm,
+    output_tokens: int = CHAT_OUTPUT_TOKENS,
+    retries: int = 0,
+) -> str:
+    """
+    retries > 0 waits out that many 429/503s instead of failing (bulk work).
+    """
+    prompt_tokens = sum(estimate_tokens(m.content) for m in messages)
 
-        messages.append(HumanMessage(content=final_message))
+    for attempt in range(retries + 1):
+        try:
+            async with openai_gate.admit(lane, prompt_tokens + output_tokens):
+                response = await asyncio.to_thread(model.invoke, messages)
+            return response.content
 
-        response = await asyncio.to_thread(llm.invoke, messages)
+        except AdmissionRejected as e:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(e.retry_after)
 
-        return {"response": response.content}
+
+# ------------------------------------------------------------------------------
+# Answer Tiers
+# ------------------------------------------------------------------------------
+#
+# 1. extractive — factual question (hours, phone, address, email) and a
+#    confident top match: the answer is sliced out of that chunk, no LLM call.
+# 2. short      — not open-ended and a confident match: short_llm over the top
+#    chunks only, no web/Reddit/Maps search.
+# 3. full       — everything else goes through the full pipeline.
+
+# Top-match cosine similarity needed for tiers 1 and 2. These depend on the
+# embedding model and corpus: the default OpenAIEmbeddings model already
+# scores loosely related text around 0.8, so the defaults are deliberately
+# strict. Derive real values with `python eval_retrieval.py --calibrate`.
+EXTRACTIVE_MIN_SIMILARITY = float(os.getenv("EXTRACTIVE_MIN_SIMILARITY", "0.92"))
+SHORT_MIN_SIMILARITY = float(os.getenv("SHORT_MIN_SIMILARITY", "0.90"))
+SHORT_CONTEXT_CHUNKS = 2
+
+# fact kind -> (question pattern, answer pattern)
+FACT_PATTERNS = {
+    "phone": (
+        re.compile(r"\b(phone|number|call|hotline|line)\b", re.IGNORECASE),
+        re.compile(r"\(?\d{3}\)?[\s.-]?\d{3}-\d{4}|\b911\b"),
+    ),
+    "email": (
+        re.compile(r"\be-?mail\b", re.IGNORECASE),
+        re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"),
+    ),
+    "hours": (
+        re.compile(r"\b(hours?|open|opens|close|closes|closing)\b", re.IGNORECASE),
+        re.compile(r"\d{1,2}(:\d{2})?\s?(am|pm)\b|24/7", re.IGNORECASE),
+    ),
+    "address": (
+        re.compile(r"\b(where|address|located|location)\b", re.IGNORECASE),
+        re.compile(r"\b(Location|Address)\s*:", re.IGNORECASE),
+    ),
+}
+
+OPEN_ENDED = re.compile(
+    r"\b(should|best|worst|recommend|worth|compare|vs|versus|why|tips|"
+    r"(?:any|some|need|your) advice|advice (?:on|for|about)|"
+    r"opinion|experience|like|hard|easy|explain|help me|how (?:do|can|should) i|"
+    r"prof|professor|instructor|teacher|lecturer|class|course|ratemyprof\w*)\b",
+    re.IGNORECASE,
+)
+
+# A capitalized name only means a person lookup next to one of these
+# ("Who is Jane Doe?", "Dr. Doe's office", "Jane Doe ECS 36A")
+PERSON_INTENT = re.compile(r"\b(who is|who's|who teaches|dr|prof)\b", re.IGNORECASE)
+COURSE_CODE = re.compile(r"\b[A-Z]{2,4} ?\d{1,3}[A-Z]?\b")
+
+# Sub-headings like "LOCATION & CONTACT" don't say what the section is about
+GENERIC_HEADING_WORDS = {"location", "contact", "hours", "services", "info", "information"}
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "whats", "when", "where", "which",
+    "who", "how", "do", "does", "i", "me", "my", "for", "of", "to", "at", "in", "on",
+    "uc", "davis", "ucd", "and", "or", "can", "it", "its", "there", "their",
+}
+
+
+def classify_question(message: str, image_content: Optional[str] = None) -> str:
+    """
+    Returns a fact kind from FACT_PATTERNS, "open" or "simple".
+    """
+    if image_content or OPEN_ENDED.search(message):
+        return "open"
+
+    # Person lookups need the web + RateMyProfessor searches of the full tier.
+    # Most capitalized phrases are offices and events ("Picnic Day"), so a
+    # name only counts next to person intent, and campus places never do.
+    if PERSON_INTENT.search(message) or COURSE_CODE.search(message):
+        if any(not campus_index.match(name) for name in extract_professor_names(message)):
+            return "open"
+
+    # Long questions usually carry nuance a one-line answer would miss
+    if len(message.split()) > 20:
+        return "open"
+
+    for kind, (question_pattern, _) in FACT_PATTERNS.items():
+        if question_pattern.search(message):
+            return kind
+
+    return "simple"
+
+
+def keywords(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS}
+
+
+def format_heading(heading: str) -> str:
+    """
+    "UC DAVIS POLICE DEPARTMENT" -> "UC Davis Police Department",
+    keeping short words and (ACRONYMS) in capitals.
+    """
+    words = []
+    for word in heading.split():
+        if word.lower() in {"and", "of", "for", "the"} and words:
+            words.append(word.lower())
+        elif len(word) <= 2 or word.startswith("("):
+            words.append(word)
+        else:
+            words.append(word.capitalize())
+    return " ".join(words)
+
+
+def extract_fact(kind: str, message: str, match: dict) -> Optional[str]:
+    """
+    Picks the line of the top chunk that holds the requested fact and best
+    overlaps the question (counting its section heading, e.g.
+    "UC DAVIS POLICE DEPARTMENT" above "- Non-emergency: (530) 752-1727").
+    """
+    _, answer_pattern = FACT_PATTERNS[kind]
+    wanted = keywords(message)
+
+    best_score, best = 0, None
+    heading = ""
+    for line in match["content"].splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.isupper():
+            if not keywords(line) <= GENERIC_HEADING_WORDS:
+                heading = line
+            continue
+        if not answer_pattern.search(line):
+            continue
+
+        score = 2 * len(wanted & keywords(line)) + len(wanted & keywords(heading))
+        if score > best_score:
+            best_score, best = score, (heading, line.lstrip("- "))
+
+    if not best:
+        return None
+
+    heading, line = best
+    source = os.path.basename((match.get("metadata") or {}).get("source", ""))
+
+    answer = f"{format_heading(heading)} — {line}" if heading else line
+    if source:
+        answer += f"\n\n(Source: {source})"
+    return answer
+
+
+async def answer_question(
+    message: str,
+    matches: List[dict],
+    conversation_history: List[HistoryMessage],
+    lane: str,
+    image_content: Optional[str] = None,
+    retries: int = 0,
+) -> dict:
+    """
+    Runs the cheapest tier that can answer. Returns {"response", "tier"}.
+    """
+    kind = classify_question(message, image_content)
+    confidence = matches[0].get("similarity", 0.0) if matches else 0.0
+
+    # Tier 1 — extractive
+    if kind in FACT_PATTERNS and confidence >= EXTRACTIVE_MIN_SIMILARITY:
+        extracted = extract_fact(kind, message, matches[0])
+        if extracted:
+            return {"response": extracted, "tier": "extractive"}
+
+    # Tier 2 — short context, low max_tokens
+    if kind != "open" and confidence >= SHORT_MIN_SIMILARITY:
+        context = "\n\n".join(d["content"] for d in matches[:SHORT_CONTEXT_CHUNKS])
+
+        # Known campus places are answered in-process, so they're free to add
+        places = campus_index.answer(message)
+        messages = build_messages(
+            message,
+            context,
+            f"=== Campus Locations ===\n{places}" if places else "",
+            conversation_history,
+            system_prompt=SHORT_SYSTEM_PROMPT,
+        )
+        response = await generate(
+            messages, lane, model=short_llm, output_tokens=SHORT_MAX_TOKENS, retries=retries
+        )
+        return {"response": response, "tier": "short"}
+
+    # Tier 3 — full pipeline: web search, RateMyProfessor, Reddit, Maps
+    web_results = await gather_web_results(message, image_content)
+
+    messages = build_messages(
+        message,
+        "\n\n".join(d["content"] for d in matches),
+        web_results,
+        conversation_history,
+        image_content,
+    )
+    response = await generate(messages, lane, retries=retries)
+    return {"response": response, "tier": "full"}
+
+
+# ------------------------------------------------------------------------------
+# Chat Endpoint
+# ------------------------------------------------------------------------------
+
+@app.post("/chat")
+async def chat(req: ChatRequest):
+    try:
+        openai_gate.check("chat")
+
+        # STEP 1 — Vector search (one index snapshot for the whole request)
+        current = index_manager.current
+        matches = cached_matches(req.message, current)
+
+        if matches is None:
+            matches = []
+            if has_knowledge_base(current):
+                query_embedding = await asyncio.to_thread(
+                    embeddings.embed_query, req.message
+                )
+                matches = await retrieve(query_embedding, current)
+            cache_matches(req.message, current, matches)
+
+        # STEP 2 — Answer with the cheapest tier that fits
+        return await answer_question(
+            req.message,
+            matches,
+            req.conversation_history,
+            "chat",
+            req.image_content,
+        )
+
+    except AdmissionRejected as e:
+        raise admission_error(e)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ------------------------------------------------------------------------------
+# Batch Chat Endpoint
+# ------------------------------------------------------------------------------
+
+MAX_BATCH_QUESTIONS = 500
+MAX_BATCH_CONCURRENCY = 8
+# How many times a batch question waits out a 429/503 before giving up
+BATCH_ADMISSION_RETRIES = 5
+
+
+@app.post("/chat/batch")
+async def chat_batch(req: BatchChatRequest):
+    """
+    Answers many questions in one call and streams one NDJSON line per
+    question as soon as its answer is ready (not in request order).
+    Duplicate questions share retrieval, web search and the generated answer.
+    """
+    if not req.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+
+    if len(req.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch",
+        )
+
+    # Group duplicates under the first spelling we saw
+    positions: Dict[str, List[int]] = {}
+    unique: Dict[str, str] = {}
+    for i, question in enumerate(req.questions):
+        key = normalize_question(question)
+        positions.setdefault(key, []).append(i)
+        unique.setdefault(key, question.strip())
+
+    keys = list(unique)
+
+    # Every question in the batch searches the same index snapshot
+    current = index_manager.current
+    known_matches: Dict[str, List[dict]] = {}
+    for key in keys:
+        matches = cached_matches(unique[key], current)
+        if matches is not None:
+            known_matches[key] = matches
+
+    # One embeddings request for every question that isn't cached
+    query_embeddings: Dict[str, List[float]] = {}
+    to_embed = [k for k in keys if k not in known_matches]
+    if to_embed and has_knowledge_base(current):
+        try:
+            vectors = await asyncio.to_thread(
+                embeddings.embed_documents, [unique[k] for k in to_embed]
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        query_embeddings = dict(zip(to_embed, vectors))
+
+    limit = asyncio.Semaphore(min(max(req.max_concurrency, 1), MAX_BATCH_CONCURRENCY))
+
+    async def answer(key: str) -> Tuple[str, dict]:
+        question = unique[key]
+
+        async with limit:
+            try:
+                matches = known_matches.get(key)
+                if matches is None:
+                    matches = []
+                    if key in query_embeddings:
+                        matches = await retrieve(query_embeddings[key], current)
+                    cache_matches(question, current, matches)
+
+                # Bulk work waits for capacity instead of failing outright
+                result = await answer_question(
+                    question,
+                    matches,
+                    req.conversation_history,
+                    "batch",
+                    retries=BATCH_ADMISSION_RETRIES,
+                )
+                return key, result
+
+            except Exception as e:
+                return key, {"error": str(e)}
+
+    async def stream():
+        tasks = [asyncio.create_task(answer(k)) for k in keys]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, result = await next_done
+                for i in positions[key]:
+                    line = {"index": i, "question": req.questions[i], **result}
+                    yield json.dumps(line) + "\n"
+        finally:
+            # Client went away: stop the questions that haven't finished
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,364 @@
+"""
+Background knowledge refresh with hot swap of the live index.
+
+A refresh re-scrapes the sources into a fresh staging directory, rebuilds
+the index off to the side (through the embedding cache, so unchanged chunks
+aren't embedded again) and then swaps it into the running app in one
+reference assignment. Requests that already picked up the old version keep
+using it until they finish; new requests see the new one.
+
+Layout:
+  index_versions/v<n>/data/    curated files + freshly scraped pages
+  index_versions/v<n>/index/   index.faiss + chunk store (local mode)
+  index_versions/CURRENT       name of the version to load on startup
+
+With Supabase the version is the build id the rows are tagged with (see
+build_vectorstore_supabase.py), and the live build is recorded there.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from build_vectorstore import build_local_index
+from postgrest.exceptions import APIError
+
+from build_vectorstore_supabase import (
+    BUILDS_TABLE,
+    delete_builds,
+    live_build,
+    publish_build,
+    start_build,
+    upload_chunks,
+)
+from chunk_store import LocalIndex, has_local_index
+from ingest import DATA_DIR, cached_embeddings
+from scrape_ucdavis import scrape_all, urls_to_scrape
+
+
+VERSIONS_DIR = "index_versions"
+CURRENT_FILE = os.path.join(VERSIONS_DIR, "CURRENT")
+# Older versions are deleted, except for this many most recent ones
+KEEP_VERSIONS = 3
+# How often a Supabase-backed server checks whether another process
+# (build_vectorstore_supabase.py, another instance) published a new build
+LIVE_BUILD_POLL_SECONDS = 60
+
+
+@dataclass
+class IndexVersion:
+    version: int
+    index: Optional[LocalIndex]   # None when Supabase serves retrieval
+    built_at: float
+    timings: Dict[str, float] = field(default_factory=dict)
+    chunks: int = 0
+    # Supabase rows carry build ids, so retrieval can filter on this version.
+    # False until supabase_builds.sql is applied.
+    tagged: bool = True
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.built_at)),
+            "chunks": self.chunks,
+            "timings": {name: round(seconds, 2) for name, seconds in self.timings.items()},
+        }
+
+
+# ------------------------------------------------------------------------------
+# Index Manager
+# ------------------------------------------------------------------------------
+
+class IndexManager:
+    """
+    Holds the live IndexVersion. Read .current once per request and use that
+    snapshot throughout, so a swap halfway through can't mix versions.
+    """
+
+    def __init__(self, current: IndexVersion):
+        self.current = current
+        self._on_swap: List[Callable[[IndexVersion, IndexVersion], None]] = []
+
+    @classmethod
+    def load(cls, supabase=None) -> "IndexManager":
+        """
+        Latest refreshed version if there is one, else ./faiss_db (version 0).
+        With a Supabase client, the live build recorded in Supabase.
+        """
+        if supabase is not None:
+            try:
+                return cls(supabase_version(live_build(supabase)))
+            except APIError as e:
+                print(f"WARNING: can't read the {BUILDS_TABLE} table ({e.message}). "
+                      "Apply backend/supabase_builds.sql; until then every row is "
+                      "searched unfiltered and rebuilds can return duplicates.", flush=True)
+                return cls(IndexVersion(version=0, index=None, built_at=time.time(), tagged=False))
+
+        version, directory = 0, "faiss_db"
+
+        if os.path.exists(CURRENT_FILE):
+            with open(CURRENT_FILE, encoding="utf-8") as f:
+                name = f.read().strip()
+            version = int(name.lstrip("v"))
+            if has_local_index(os.path.join(VERSIONS_DIR, name, "index")):
+                directory = os.path.join(VERSIONS_DIR, name, "index")
+
+        index = LocalIndex(directory) if has_local_index(directory) else None
+        return cls(IndexVersion(
+            version=version,
+            index=index,
+            built_at=os.path.getmtime(directory) if index else time.time(),
+            chunks=len(index) if index else 0,
+        ))
+
+    @property
+    def version(self) -> int:
+        return self.current.version
+
+    def on_swap(self, callback: Callable[[IndexVersion, IndexVersion], None]):
+        """callback(old, new) runs right after every swap, e.g. to clear caches."""
+        self._on_swap.append(callback)
+
+    def swap(self, new: IndexVersion):
+        old, self.current = self.current, new
+        for callback in self._on_swap:
+            callback(old, new)
+
+
+def supabase_version(live: Optional[dict]) -> IndexVersion:
+    live = live or {}
+    return IndexVersion(
+        version=live.get("id", 0),
+        index=None,
+        built_at=time.time(),
+        chunks=live.get("chunks", 0),
+    )
+
+
+# ------------------------------------------------------------------------------
+# Building
+# ------------------------------------------------------------------------------
+
+def existing_versions() -> List[int]:
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    return sorted(
+        int(name[1:]) for name in os.listdir(VERSIONS_DIR)
+        if re.fullmatch(r"v\d+", name)
+    )
+
+
+def page_key(url: str) -> str:
+    """Hosts are case-insensitive: ICC.ucdavis.edu is icc.ucdavis.edu."""
+    parts = urlsplit(url.strip())
+    return f"{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+def stage_data(data_dir: str, urls: List[str]) -> Dict[str, float]:
+    """
+    Copies the hand-written files from uc_davis_data and scrapes every url
+    fresh. Pages that fail to scrape, and previously scraped pages whose url
+    isn't in the list any more, keep their previous copy.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+
+    previous_pages = {}
+    for name in os.listdir(DATA_DIR):
+        path = os.path.join(DATA_DIR, name)
+        if not name.endswith(".txt"):
+            continue
+        if name.startswith("scraped_"):
+            with open(path, encoding="utf-8") as f:
+                first_line = f.readline()
+            if first_line.startswith("SOURCE: "):
+                previous_pages[page_key(first_line[len("SOURCE: "):])] = path
+        else:
+            shutil.copy(path, data_dir)
+
+    # The url list has a few duplicates, scraping them twice only adds noise
+    unique: Dict[str, str] = {}
+    for url in urls:
+        unique.setdefault(page_key(url), url)
+    urls = list(unique.values())
+
+    started = time.perf_counter()
+    failed = scrape_all(urls, output_dir=data_dir)
+    scrape_seconds = time.perf_counter() - started
+
+    scraped = {page_key(url) for url in urls} - {page_key(url) for url in failed}
+    for i, (key, path) in enumerate(sorted(previous_pages.items())):
+        if key not in scraped:
+            shutil.copy(path, os.path.join(data_dir, f"scraped_stale_{i}.txt"))
+
+    return {"scrape": scrape_seconds}
+
+
+def build_version(version: int, supabase=None) -> IndexVersion:
+    """
+    Runs a full refresh into index_versions/v<version>. Blocking, so call it
+    from a worker thread. With a Supabase client the new chunks are uploaded
+    there as a new build instead of building a local index; the build goes
+    live in Supabase once the upload is complete.
+    """
+    if supabase is not None:
+        # Build ids are shared with every other uploader of the table
+        version = start_build(supabase, at_least=version)
+
+    directory = os.path.join(VERSIONS_DIR, f"v{version}")
+    data_dir = os.path.join(directory, "data")
+    index_dir = os.path.join(directory, "index")
+
+    timings = stage_data(data_dir, urls_to_scrape)
+    embeddings = cached_embeddings()
+
+    started = time.perf_counter()
+    if supabase is not None:
+        chunks = upload_chunks(supabase, version, data_dir, embeddings)
+    else:
+        chunks = build_local_index(index_dir, data_dir, embeddings)
+    timings["build"] = time.perf_counter() - started
+
+    if not chunks:
+        raise RuntimeError(f"Refresh v{version} produced no chunks")
+
+    index = None
+    if supabase is None:
+        started = time.perf_counter()
+        index = LocalIndex(index_dir)
+        timings["load"] = time.perf_counter() - started
+    else:
+        publish_build(supabase, version, chunks)
+
+    # Point the next startup at this version; os.replace is atomic
+    with open(CURRENT_FILE + ".tmp", "w", encoding="utf-8") as f:
+        f.write(f"v{version}")
+    os.replace(CURRENT_FILE + ".tmp", CURRENT_FILE)
+
+    timings["total"] = sum(timings.values())
+    return IndexVersion(
+        version=version,
+        index=index,
+        built_at=time.time(),
+        timings=timings,
+        chunks=chunks,
+    )
+
+
+def prune_versions(live: int, keep: int = KEEP_VERSIONS):
+    # Safe with requests still reading an older version: their mmaps stay
+    # valid after the files are unlinked. The live version is never removed.
+    for version in existing_versions()[:-keep]:
+        if version == live:
+            continue
+        shutil.rmtree(os.path.join(VERSIONS_DIR, f"v{version}"), ignore_errors=True)
+
+
+# ------------------------------------------------------------------------------
+# Scheduler
+# ------------------------------------------------------------------------------
+
+class RefreshScheduler:
+
+    def __init__(self, manager: IndexManager, interval_hours: float, supabase=None):
+        self.manager = manager
+        self.interval = interval_hours * 3600
+        self.supabase = supabase
+
+        self.running = False
+        self.last_error: Optional[str] = None
+        self.next_run_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._follow_task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> IndexVersion:
+        """
+        One refresh cycle. The build runs in a worker thread; the swap
+        happens back on the event loop.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A refresh is already running")
+
+        self.running = True
+        try:
+            version = max(existing_versions() + [self.manager.version]) + 1
+            print(f"Refreshing knowledge base as v{version}...", flush=True)
+
+            new = await asyncio.to_thread(build_version, version, self.supabase)
+            self.manager.swap(new)
+            self.last_error = None
+            print(f"✓ Swapped in v{new.version} ({new.chunks} chunks, "
+                  f"{new.timings['total']:.0f}s)", flush=True)
+
+            await asyncio.to_thread(prune_versions, new.version)
+            if self.supabase is not None:
+                await asyncio.to_thread(delete_builds, self.supabase)
+            return new
+
+        except Exception as e:
+            self.last_error = str(e)
+            print("Refresh error:", e, flush=True)
+            raise
+
+        finally:
+            self.running = False
+            self._lock.release()
+
+    async def _loop(self):
+        while True:
+            self.next_run_at = time.time() + self.interval
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception:
+                # Already recorded in last_error; keep serving the old version
+                pass
+
+    async def _follow(self):
+        """
+        Swaps to builds published elsewhere. Runs even with scheduled
+        refreshes off, since that's how the manual rebuild reaches the server.
+        """
+        while True:
+            await asyncio.sleep(LIVE_BUILD_POLL_SECONDS)
+            if self.running:
+                continue
+            try:
+                live = await asyncio.to_thread(live_build, self.supabase)
+            except Exception as e:
+                print("Live build check error:", e, flush=True)
+                continue
+
+            if live and live["id"] != self.manager.version:
+                self.manager.swap(supabase_version(live))
+                print(f"✓ Switched to Supabase build {live['id']} ({live['chunks']} chunks)", flush=True)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+        if self.supabase is not None and self.manager.current.tagged and self._follow_task is None:
+            self._follow_task = asyncio.create_task(self._follow())
+
+    def stop(self):
+        for task in (self._task, self._follow_task):
+            if task:
+                task.cancel()
+        self._task = self._follow_task = None
+
+    def info(self) -> dict:
+        return {
+            "enabled": self.interval > 0,
+            "interval_hours": self.interval / 3600,
+            "running": self.running,
+            "last_error": self.last_error,
+            "next_run_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.next_run_at))
+            if self.next_run_at else None,
+        }
@@ -38,6 +38,8 @@ urls_to_scrape = [
     # Academics
     "https://catalog.ucdavis.edu/",
     "https://ucdavis.edu/academics",
+    "https://www.ucdavis.edu/academics/majors",
+    "https://www.ucdavis.edu/academics/minors",
     "https://registrar.ucdavis.edu/",
     
     # Housing
@@ -98,36 +100,53 @@ urls_to_scrape = [
       # Add your new URL here
 ]
 
-print("Starting web scraping...")
-print(f"Will scrape {len(urls_to_scrape)} pages")
+def next_scraped_number(output_dir='uc_davis_data'):
+    """Find the next available scraped_<n>.txt number"""
+    existing_files = [f for f in os.listdir(output_dir) if f.startswith('scraped_') and f.endswith('.txt')]
+    if existing_files:
+        # Get highest number
+        numbers = [int(f.replace('scraped_', '').replace('.txt', '')) for f in existing_files]
+        return max(numbers) + 1
+    return 1
 
-# Find the next available file number
-existing_files = [f for f in os.listdir('uc_davis_data') if f.startswith('scraped_') and f.endswith('.txt')]
-if existing_files:
-    # Get highest number
-    numbers = [int(f.replace('scraped_', '').replace('.txt', '')) for f in existing_files]
-    start_num = max(numbers) + 1
-else:
-    start_num = 1
 
-print(f"Starting at scraped_{start_num}.txt")
+def scrape_all(urls, output_dir='uc_davis_data', start_num=1, delay=2):
+    """Scrape every url into output_dir/scraped_<n>.txt and return the urls that failed"""
+    failed = []
+
+    # Scrape each page
+    for i, url in enumerate(urls, start=start_num):
+        print(f"\nScraping {url}...")
+        text = scrape_page(url)
+
+        if text:
+            # Save to file in the output folder
+            filename = os.path.join(output_dir, f"scraped_{i}.txt")
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(f"SOURCE: {url}\n\n{text}")
+            print(f"  ✓ Saved to {filename} ({len(text)} characters)")
+        else:
+            print(f"  ✗ Failed to scrape")
+            failed.append(url)
+
+        # Be polite - wait between requests
+        time.sleep(delay)
+
+    return failed
+
+
+def main():
+    print("Starting web scraping...")
+    print(f"Will scrape {len(urls_to_scrape)} pages")
+
+    start_num = next_scraped_number()
+    print(f"Starting at scraped_{start_num}.txt")
+
+    scrape_all(urls_to_scrape, start_num=start_num)
+
+    print("\n✓ Done scraping!")
+    print("Next step: Run 'python build_vectorstore_supabase.py' to upload to Supabase")
 
-# Scrape each page
-for i, url in enumerate(urls_to_scrape, start=start_num):
-    print(f"\nScraping {url}...")
-    text = scrape_page(url)
-    
-    if text:
-        # Save to file in uc_davis_data folder
-        filename = f"uc_davis_data/scraped_{i}.txt"
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"SOURCE: {url}\n\n{text}")
-        print(f"  ✓ Saved to {filename} ({len(text)} characters)")
-    else:
-        print(f"  ✗ Failed to scrape")
-    
-    # Be polite - wait between requests
-    time.sleep(2)
 
-print("\n✓ Done scraping!")
-print("Next step: Run 'python build_vectorstore_supabase.py' to upload to Supabase")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
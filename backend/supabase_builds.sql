@@ -0,0 +1,47 @@
+-- Versioned builds of the documents table (see build_vectorstore_supabase.py).
+-- Run once in the Supabase SQL editor.
+
+create table if not exists document_builds (
+  id bigint primary key,
+  chunks integer not null default 0,
+  started_at timestamptz not null default now(),
+  completed_at timestamptz
+);
+
+-- Rows uploaded before builds existed become build 0, the live one
+update documents
+set metadata = metadata || '{"build": 0}'::jsonb
+where not (metadata ? 'build');
+
+insert into document_builds (id, chunks, completed_at)
+select 0, count(*), now() from documents
+on conflict (id) do nothing;
+
+-- match_documents has to honour the filter argument, since the server
+-- always passes {"build": <live build>}
+create or replace function match_documents (
+  query_embedding vector(1536),
+  match_count int default null,
+  filter jsonb default '{}'
+) returns table (
+  id bigint,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    id,
+    content,
+    metadata,
+    1 - (documents.embedding <=> query_embedding) as similarity
+  from documents
+  where metadata @> filter
+  order by documents.embedding <=> query_embedding
+  limit match_count;
+end;
+$$;
@@ -0,0 +1,88 @@
+"""
+Round-trip tests for the memory-mapped chunk store.
+
+Run with: python -m pytest test_chunk_store.py
+"""
+
+import os
+
+import pytest
+
+from chunk_store import (
+    CHUNKS_FILE,
+    METADATA_FILE,
+    ChunkStore,
+    ChunkStoreWriter,
+    has_local_index,
+    publish,
+    staging_directory,
+)
+
+
+def write_store(directory, chunks):
+    with ChunkStoreWriter(directory) as writer:
+        for text, metadata in chunks:
+            writer.add(text, metadata)
+
+
+def test_round_trip(tmp_path):
+    chunks = [
+        ("first chunk", {"source": "a.txt"}),
+        ("zweiter Abschnitt — ünïcödé", {"source": "b.txt", "page": 2}),
+        ("", {"source": "a.txt"}),
+        ("last", {"source": "b.txt", "tags": ["x", "y"]}),
+    ]
+    write_store(tmp_path, chunks)
+
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == len(chunks)
+    for i, (text, metadata) in enumerate(chunks):
+        assert store.get(i) == {"content": text, "metadata": metadata}
+
+
+def test_missing_metadata_columns(tmp_path):
+    # "page" only appears on the second chunk, "source" is missing from the last
+    chunks = [
+        ("one", {"source": "a.txt"}),
+        ("two", {"source": "a.txt", "page": 1}),
+        ("three", {"source": "b.txt"}),
+        ("four", {}),
+    ]
+    write_store(tmp_path, chunks)
+
+    store = ChunkStore(str(tmp_path))
+    assert [store.metadata(i) for i in range(len(chunks))] == [m for _, m in chunks]
+
+
+def test_empty_store(tmp_path):
+    write_store(tmp_path, [])
+
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == 0
+    assert os.path.getsize(tmp_path / CHUNKS_FILE) == 0
+
+
+def test_failed_build_leaves_no_metadata(tmp_path):
+    with pytest.raises(RuntimeError):
+        with ChunkStoreWriter(str(tmp_path)) as writer:
+            writer.add("partial", {"source": "a.txt"})
+            raise RuntimeError("embedding request failed")
+
+    assert not os.path.exists(tmp_path / METADATA_FILE)
+
+
+def test_publish_keeps_mapped_store_readable(tmp_path):
+    live = str(tmp_path / "faiss_db")
+    write_store(live, [("old text", {"source": "old.txt"})])
+    old_store = ChunkStore(live)
+
+    staging = staging_directory(live)
+    write_store(staging, [("new text", {"source": "new.txt"}), ("more", {})])
+    publish(staging, live)
+
+    assert not os.path.exists(staging)
+    assert old_store.text(0) == "old text"
+    assert ChunkStore(live).text(0) == "new text"
+    assert len(ChunkStore(live)) == 2
+    # Only the build scripts add index.faiss
+    assert not has_local_index(live)